@@ -1,6 +1,8 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
 """Dark matter profiles."""
 import abc
+import math
+from functools import lru_cache
 import numpy as np
 import astropy.units as u
 from gammapy.modeling import Parameter, Parameters
@@ -16,6 +18,31 @@ __all__ = [
 ]
 
 
+@lru_cache(maxsize=32)
+def _log_grid(logmin, logmax, n):
+    """Read-only log-spaced integration grid, cached per bounds and size."""
+    x = np.logspace(logmin, logmax, n)
+    x.flags.writeable = False
+    return x
+
+
+def _trapz_inverse_sqrt(g, sqrt_x, x):
+    r"""Trapezoidal rule for :math:`g(x) / \sqrt{x - x_0}` along the last axis.
+
+    The smooth part ``g`` is interpolated linearly on each interval and
+    integrated exactly against the :math:`1 / \sqrt{x - x_0}` weight, given
+    ``sqrt_x`` :math:`= \sqrt{x - x_0}` (product integration). The rule is
+    second order also on grids starting at the singularity :math:`x = x_0`.
+    """
+    g_lo, g_hi = g[..., :-1], g[..., 1:]
+    sqrt_lo, sqrt_hi = sqrt_x[..., :-1], sqrt_x[..., 1:]
+
+    sqrt_sum = sqrt_hi + sqrt_lo
+    weight_hi = (sqrt_hi + 2 * sqrt_lo) / (3 * sqrt_sum)
+    val = 2 * np.diff(x) / sqrt_sum * (g_lo + (g_hi - g_lo) * weight_hi)
+    return val.sum(axis=-1)
+
+
 class DMProfile(abc.ABC):
     """DMProfile model base class."""
 
@@ -24,67 +51,219 @@ class DMProfile(abc.ABC):
     DISTANCE_GC = 8.33 * u.kpc
     """Distance to the Galactic Center as given in reference 2"""
 
+    _LENGTH_UNIT = u.kpc
+    _DENSITY_UNIT = u.Unit("GeV / cm3")
+    """Units of the bare length and density values used by `_evaluate_value`"""
+    _MAX_GRID_SIZE = 2**22
+    """Maximum number of grid points per chunk evaluated by `integral`"""
+    _cached_parameter_key = None
+
     def __call__(self, radius):
         """Call evaluate method of derived classes."""
-        kwargs = {par.name: par.quantity for par in self.parameters}
-        return self.evaluate(radius, **kwargs)
+        value = self._evaluate_value(u.Quantity(radius).to_value(u.kpc))
+        return u.Quantity(value, self._DENSITY_UNIT, copy=False)
+
+    def _evaluate_value(self, radius):
+        """Evaluate on bare radius values in kpc, returning values in GeV / cm3.
+
+        The ``evaluate`` methods only depend on ``radius / r_s`` and scale
+        with ``rho_s``, so they can be called on plain floats, avoiding the
+        `~astropy.units.Quantity` overhead on the integration grid.
+        """
+        return self.evaluate(radius, **self._parameter_values())
+
+    def _parameter_values(self):
+        """Bare parameter values, converted again only if a parameter changed."""
+        key = [(par.value, par.unit) for par in self.parameters]
+
+        if key != self._cached_parameter_key:
+            self._cached_parameter_key = key
+            self._cached_parameter_values = {
+                par.name: par.quantity.to_value(self._value_unit(par.unit))
+                for par in self.parameters
+            }
+
+        return self._cached_parameter_values
+
+    @classmethod
+    def _value_unit(cls, unit):
+        """Unit of the bare values for a parameter unit, by physical type.
+
+        Lengths are given in kpc, densities in GeV / cm3, any other
+        parameter must be dimensionless.
+        """
+        for value_unit in [cls._LENGTH_UNIT, cls._DENSITY_UNIT]:
+            if unit.is_equivalent(value_unit):
+                return value_unit
+
+        return u.dimensionless_unscaled
+
+    def evaluate_grid(self, radius, **kwargs):
+        """Evaluate the profile for many parameter sets at once.
+
+        The parameter arrays are broadcast against the radius grid, so all
+        parameter sets are evaluated in one pass instead of a Python loop
+        over profile instances.
+
+        Parameters
+        ----------
+        radius : `~astropy.units.Quantity`
+            Radius grid with shape ``(n_r,)``.
+        **kwargs : `~astropy.units.Quantity`
+            Parameter values with shape ``(n_sample,)``, e.g. ``r_s`` or
+            ``rho_s``. Parameters not given take the current profile value.
+
+        Returns
+        -------
+        density : `~astropy.units.Quantity`
+            Density with shape ``(n_sample, n_r)``.
+        """
+        values = self._parameter_values().copy()
+
+        for name, value in kwargs.items():
+            if name not in values:
+                raise ValueError(f"Unknown parameter: '{name}'")
+
+            value = u.Quantity(value)
+            value = value.to_value(self._value_unit(value.unit))
+            values[name] = np.atleast_1d(value)[..., np.newaxis]
+
+        radius = u.Quantity(radius).to_value(u.kpc)
+        value = self.evaluate(radius, **values)
+        return u.Quantity(value, self._DENSITY_UNIT, copy=False)
 
     def scale_to_local_density(self):
         """Scale to local density."""
-        scale = (self.LOCAL_DENSITY / self(self.DISTANCE_GC)).to_value("")
+        local_density = self.LOCAL_DENSITY.to_value(self._DENSITY_UNIT)
+        distance_gc = self.DISTANCE_GC.to_value(self._LENGTH_UNIT)
+        scale = local_density / self._evaluate_value(distance_gc)
         self.parameters["rho_s"].value *= scale
 
-    def _eval_squared(self, radius, separation):
-        """Squared density at given radius together with the substitution part"""
-        return (
-            self(radius) ** 2
-            * radius
-            / np.sqrt(radius**2 - (self.DISTANCE_GC * np.sin(separation)) ** 2)
-        )
+    def _eval_squared(self, radius, r_tan):
+        r"""Squared density at given radius together with the substitution part.
 
-    def integral(self, rmin, rmax, separation, ndecade):
+        The integrand :math:`\rho(r)^2 r / \sqrt{r^2 - r_t^2}`, with the line
+        of sight tangent point :math:`r_t`, is returned split into its smooth
+        part :math:`g(r) = \rho(r)^2 r / \sqrt{r + r_t}` and the singular
+        :math:`\sqrt{r - r_t}`, both on bare radius and ``r_tan`` values in kpc.
+        """
+        value = self._evaluate_value(radius)
+        value *= value
+        value *= radius
+
+        # only the substitution part depends on the separation, so the
+        # broadcast (..., n) arrays are updated in place
+        smooth = np.add(radius, r_tan)
+        np.sqrt(smooth, out=smooth)
+        np.divide(value, smooth, out=smooth)
+
+        # the grid may start a round-off below the tangent point
+        singular = np.subtract(radius, r_tan)
+        np.maximum(singular, 0, out=singular)
+        np.sqrt(singular, out=singular)
+        return smooth, singular
+
+    def integral(self, rmin, rmax, separation, ndecade=200):
         r"""Integrate squared dark matter profile numerically.
 
         .. math::
             F(r_{min}, r_{max}) = \int_{r_{min}}^{r_{max}}\rho(r)^2 dr
 
+        The integrable :math:`1 / \sqrt{r - r_t}` singularity at the line of
+        sight tangent point :math:`r_t` is integrated analytically on each
+        grid interval (see `_trapz_inverse_sqrt`), so that ``rmin`` may lie
+        on or close to the tangent point.
+
         Parameters
         ----------
         rmin, rmax : `~astropy.units.Quantity`
-            Lower and upper bound of integration range.
-        separation : `~numpy.ndarray`
-            Separation angle in rad
+            Lower and upper bound of integration range. Arrays must
+            broadcast with ``separation``.
+        separation : `~numpy.ndarray` or `~astropy.units.Quantity`
+            Separation angle, in rad if given without unit. All separations
+            are integrated at once, in vectorised evaluations over chunks of
+            at most ``_MAX_GRID_SIZE`` grid points, to bound the memory use
+            for large maps.
         ndecade    : int, optional
             Number of grid points per decade used for the integration.
-            Default : 10000
+            Default : 200
+
+        Returns
+        -------
+        integral : `~astropy.units.Quantity`
+            Integral, with the broadcast shape of the bounds and ``separation``.
         """
-        integral = self.integrate_spectrum_separation(
-            self._eval_squared, rmin, rmax, separation, ndecade
-        )
-        return integral.to("GeV2 / cm5")
+        # bare values, a dimensionless Quantity would taint the radius grid
+        separation = u.Quantity(separation, "rad").to_value("rad")
+        r_tan = self.DISTANCE_GC.to_value(self._LENGTH_UNIT) * np.sin(separation)
+        logmin = np.log10(rmin.to_value(u.kpc))
+        logmax = np.log10(rmax.to_value(u.kpc))
+        # round up, so that the grid has at least ``ndecade`` intervals per decade
+        n = int(math.ceil(np.max(logmax - logmin) * ndecade)) + 1
+
+        shape = np.broadcast_shapes(np.shape(logmin), np.shape(logmax), np.shape(r_tan))
+        size, step = int(np.prod(shape)), max(self._MAX_GRID_SIZE // n, 1)
+
+        if size <= step:
+            integral = self._integral_values(logmin, logmax, r_tan, n)
+        else:
+            flat = [
+                np.broadcast_to(_, shape).ravel() if np.ndim(_) else _
+                for _ in (logmin, logmax, r_tan)
+            ]
+            integral = np.empty(size)
+            for idx in range(0, size, step):
+                chunk = [_[idx : idx + step] if np.ndim(_) else _ for _ in flat]
+                integral[idx : idx + step] = self._integral_values(*chunk, n)
+            integral = integral.reshape(shape)
+
+        unit = self._DENSITY_UNIT**2 * self._LENGTH_UNIT
+        return u.Quantity(integral, unit, copy=False).to("GeV2 / cm5")
+
+    def _integral_values(self, logmin, logmax, r_tan, n):
+        """Integral in GeV2 cm-6 kpc on log grids of ``n`` points along the last axis"""
+        if np.isscalar(logmin) and np.isscalar(logmax):
+            radius = _log_grid(logmin, logmax, n)
+        else:
+            # one grid per element of the bounds
+            logmin, logmax = np.broadcast_arrays(logmin, logmax)
+            radius = np.logspace(logmin, logmax, n, axis=-1)
+
+        smooth, singular = self._eval_squared(radius, r_tan[..., np.newaxis])
+        return _trapz_inverse_sqrt(smooth, singular, radius)
 
     def integrate_spectrum_separation(self, func, xmin, xmax, separation, ndecade):
-        r"""Helper for the squared dark matter profile integral.
+        r"""Integrate a function of radius and separation in log-log space.
 
         Parameters
         ----------
+        func : callable
+            Function of radius and separation to integrate.
         xmin, xmax : `~astropy.units.Quantity`
             Lower and upper bound of integration range.
         separation : `~numpy.ndarray`
             Separation angle in rad
         ndecade    : int
             Number of grid points per decade used for the integration.
+
+        Returns
+        -------
+        integral : `~astropy.units.Quantity`
+            Integral, with the same shape as ``separation``.
         """
+        separation = np.asanyarray(separation)
         unit = xmin.unit
         xmin = xmin.value
         xmax = xmax.to_value(unit)
         logmin = np.log10(xmin)
         logmax = np.log10(xmax)
-        n = np.int32((logmax - logmin) * ndecade)
-        x = np.logspace(logmin, logmax, n) * unit
-        y = func(x, separation)
-        val = trapz_loglog(y, x)
-        return val.sum()
+        n = int(math.ceil((logmax - logmin) * ndecade)) + 1
+        x = u.Quantity(_log_grid(logmin, logmax, n), unit, copy=False)
+        # evaluate all separations at once on a (..., n) grid
+        y = func(x, separation[..., np.newaxis])
+        x = np.broadcast_to(x, y.shape, subok=True)
+        val = trapz_loglog(y, x, axis=-1)
+        return val.sum(axis=0)
 
 
 class NFWProfile(DMProfile):
@@ -164,8 +343,8 @@ class EinastoProfile(DMProfile):
     @staticmethod
     def evaluate(radius, r_s, alpha, rho_s):
         rr = radius / r_s
-        exponent = (2 / alpha) * (rr**alpha - 1)
-        return rho_s * np.exp(-1 * exponent)
+        exponent = (2 / alpha) * (1 - rr**alpha)
+        return rho_s * np.exp(exponent)
 
 
 class IsothermalProfile(DMProfile):
@@ -263,5 +442,4 @@ class MooreProfile(DMProfile):
     @staticmethod
     def evaluate(radius, r_s, rho_s):
         rr = radius / r_s
-        rr_ = r_s / radius
-        return rho_s * rr_**1.16 * (1 + rr) ** (-1.84)
+        return rho_s * rr ** (-1.16) * (1 + rr) ** (-1.84)
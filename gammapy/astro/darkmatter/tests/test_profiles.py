@@ -1,6 +1,10 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
 import pytest
+import numpy as np
+import astropy.units as u
+from astropy.coordinates import Angle
 from gammapy.astro.darkmatter import profiles
+from gammapy.modeling import Parameter, Parameters
 from gammapy.utils.testing import assert_quantity_allclose
 
 dm_profiles = [
@@ -20,3 +24,147 @@ def test_profiles(profile):
     desired = p.LOCAL_DENSITY
 
     assert_quantity_allclose(actual, desired)
+
+
+class CoredProfile(profiles.DMProfile):
+    def __init__(self):
+        self.parameters = Parameters(
+            [
+                Parameter("r_s", 10 * u.kpc),
+                Parameter("r_c", 1000 * u.pc),
+                Parameter("rho_s", 1 * u.Unit("GeV / cm3")),
+            ]
+        )
+
+    @staticmethod
+    def evaluate(radius, r_s, r_c, rho_s):
+        return rho_s / (1 + (radius + r_c) / r_s)
+
+
+def test_profiles_custom_parameter_units():
+    p = CoredProfile()
+    actual = p([1, 9] * u.kpc)
+    assert_quantity_allclose(actual, [1 / 1.2, 0.5] * u.Unit("GeV / cm3"))
+
+
+def test_profiles_constants_override(monkeypatch):
+    monkeypatch.setattr(profiles.DMProfile, "DISTANCE_GC", 8.5 * u.kpc)
+    monkeypatch.setattr(profiles.DMProfile, "LOCAL_DENSITY", 0.39 * u.Unit("GeV / cm3"))
+
+    p = profiles.NFWProfile()
+    p.scale_to_local_density()
+    assert_quantity_allclose(p(8.5 * u.kpc), 0.39 * u.Unit("GeV / cm3"))
+
+    actual = p.integral(1 * u.kpc, 10 * u.kpc, 0.1)
+    assert_quantity_allclose(actual, 8.7832e22 * u.Unit("GeV2 / cm5"), rtol=1e-4)
+
+
+@pytest.mark.parametrize("profile", dm_profiles)
+def test_profiles_integral_separation_array(profile):
+    p = profile()
+    separation = np.array([0.01, 0.05, 0.1])
+    rmin, rmax = 1 * u.kpc, 10 * u.kpc
+
+    actual = p.integral(rmin, rmax, separation, ndecade=1000)
+    desired = u.Quantity([p.integral(rmin, rmax, _, ndecade=1000) for _ in separation])
+
+    assert actual.shape == separation.shape
+    assert_quantity_allclose(actual, desired)
+
+
+def test_profiles_integral_separation_angle():
+    p = profiles.NFWProfile()
+    rmin, rmax = 1 * u.kpc, 10 * u.kpc
+
+    actual = p.integral(rmin, rmax, Angle([0.1, 0.2], "rad").to("deg"), ndecade=1000)
+    desired = p.integral(rmin, rmax, np.array([0.1, 0.2]), ndecade=1000)
+    assert_quantity_allclose(actual, desired)
+
+
+def test_profiles_integral_parameter_units():
+    p_kpc = profiles.NFWProfile(r_s=24.42 * u.kpc, rho_s=1 * u.Unit("GeV / cm3"))
+    p_pc = profiles.NFWProfile(r_s=24420 * u.pc, rho_s=1e3 * u.Unit("MeV / cm3"))
+
+    actual = p_pc.integral(1 * u.kpc, 10 * u.kpc, 0.1, ndecade=1000)
+    desired = p_kpc.integral(1 * u.kpc, 10 * u.kpc, 0.1, ndecade=1000)
+
+    assert_quantity_allclose(actual, desired)
+
+
+@pytest.mark.parametrize("separation", [1e-5, 1e-4, 1e-3, 0.05, 0.5])
+@pytest.mark.parametrize("profile", dm_profiles)
+def test_profiles_integral_tangent_point(profile, separation):
+    p = profile()
+    rmin = p.DISTANCE_GC * np.sin(separation)
+
+    actual = p.integral(rmin, p.DISTANCE_GC, separation, ndecade=200)
+    desired = p.integral(rmin, p.DISTANCE_GC, separation, ndecade=2000)
+
+    assert np.isfinite(actual)
+    assert_quantity_allclose(actual, desired, rtol=1e-4)
+
+
+def test_profiles_integral_bounds_array():
+    p = profiles.NFWProfile()
+    separation = np.array([0.01, 0.05, 0.1])
+    rmin = np.tan(separation) * p.DISTANCE_GC
+
+    actual = p.integral(rmin, p.DISTANCE_GC, separation)
+    desired = u.Quantity(
+        [p.integral(r, p.DISTANCE_GC, s) for r, s in zip(rmin, separation)]
+    )
+
+    assert actual.shape == separation.shape
+    assert_quantity_allclose(actual, desired, rtol=1e-4)
+
+
+def test_profiles_integral_chunked(monkeypatch):
+    p = profiles.NFWProfile()
+    separation = np.linspace(0.01, 0.1, 12).reshape((3, 4))
+    rmin = np.tan(separation) * p.DISTANCE_GC
+
+    desired = p.integral(rmin, p.DISTANCE_GC, separation)
+    monkeypatch.setattr(profiles.DMProfile, "_MAX_GRID_SIZE", 1000)
+    actual = p.integral(rmin, p.DISTANCE_GC, separation)
+
+    assert actual.shape == separation.shape
+    assert_quantity_allclose(actual, desired)
+
+
+def test_profiles_parameter_change():
+    p = profiles.NFWProfile()
+    radius = [1, 10] * u.kpc
+    p(radius)
+
+    p.parameters["r_s"].quantity = 2 * u.kpc
+    p.parameters["rho_s"].value = 2
+
+    desired = p.evaluate(radius, r_s=2 * u.kpc, rho_s=2 * u.Unit("GeV cm-3"))
+    assert_quantity_allclose(p(radius), desired)
+
+
+def test_profiles_evaluate_grid():
+    p = profiles.EinastoProfile()
+    radius = [1, 10, 100] * u.kpc
+    r_s = [10, 20] * u.kpc
+    alpha = [0.1, 0.17]
+
+    actual = p.evaluate_grid(radius, r_s=r_s, alpha=alpha)
+    assert actual.shape == (2, 3)
+
+    for idx in range(2):
+        p_idx = profiles.EinastoProfile(r_s=r_s[idx], alpha=alpha[idx])
+        assert_quantity_allclose(actual[idx], p_idx(radius))
+
+    with pytest.raises(ValueError):
+        p.evaluate_grid(radius, gamma=[1, 2])
+
+
+def test_profiles_integral_small_range():
+    # range below one grid interval, which used to give an empty grid
+    p = profiles.NFWProfile()
+    rmin, rmax = 1 * u.kpc, 1.001 * u.kpc
+
+    actual = p.integral(rmin, rmax, separation=0)
+    desired = p(1.0005 * u.kpc) ** 2 * (rmax - rmin)
+    assert_quantity_allclose(actual, desired, rtol=1e-6)
@@ -27,7 +27,7 @@ class JFactory:
         self.profile = profile
         self.distance = distance
 
-    def compute_differential_jfactor(self, ndecade=1e4):
+    def compute_differential_jfactor(self, ndecade=200):
         r"""Compute differential J-Factor.
 
         .. math::
@@ -35,32 +35,14 @@ class JFactory:
             \int_{\mathrm{LoS}} \mathrm d l \rho(l)^2
         """
         separation = self.geom.separation(self.geom.center_skydir).rad
-        rmin = u.Quantity(
-            value=np.tan(separation) * self.distance, unit=self.distance.unit
-        )
+        rmin = np.tan(separation) * self.distance
         rmax = self.distance
-        val = [
-            (
-                2
-                * self.profile.integral(
-                    _.value * u.kpc,
-                    rmax,
-                    np.arctan(_.value / self.distance.value),
-                    ndecade,
-                )
-                + self.profile.integral(
-                    self.distance,
-                    4 * rmax,
-                    np.arctan(_.value / self.distance.value),
-                    ndecade,
-                )
-            )
-            for _ in rmin.ravel()
-        ]
-        jfact = u.Quantity(val).to("GeV2 cm-5").reshape(rmin.shape)
+        jfact = 2 * self.profile.integral(rmin, rmax, separation, ndecade)
+        jfact += self.profile.integral(self.distance, 4 * rmax, separation, ndecade)
+        jfact = jfact.to("GeV2 cm-5")
         return jfact / u.steradian
 
-    def compute_jfactor(self, ndecade=1e4):
+    def compute_jfactor(self, ndecade=200):
         r"""Compute astrophysical J-Factor.
 
         .. math::
@@ -3,7 +3,6 @@ import abc
 import numpy as np
 from astropy import units as u
 from astropy.io import fits
-from astropy.table import Table
 from gammapy.data import GTI
 from gammapy.irf import EDispKernel, EDispKernelMap
 from gammapy.maps import RegionNDMap
@@ -197,9 +196,10 @@ class OGIPDatasetWriter(DatasetWriter):
         counts = dataset.counts_off if is_bkg else dataset.counts
         acceptance = dataset.acceptance_off if is_bkg else dataset.acceptance
 
-        hdulist = counts.to_hdulist(format=self.format)
-
-        table = Table.read(hdulist["SPECTRUM"])
+        # build the spectrum table in memory, instead of reading it back
+        # from the HDU created by `RegionNDMap.to_hdulist`
+        table = counts.to_table(format="ogip")
+        table.meta = {key.upper(): value for key, value in table.meta.items()}
         meta = self.get_ogip_meta(dataset, is_bkg=is_bkg)
 
         if dataset.mask_safe is not None:
@@ -215,7 +215,13 @@ class OGIPDatasetWriter(DatasetWriter):
 
         # adapt meta data
         table.meta.update(meta)
-        hdulist["SPECTRUM"] = fits.BinTableHDU(table)
+
+        hdulist = fits.HDUList()
+        hdulist.append(fits.BinTableHDU(table))
+        hdulist_geom = counts.geom.to_hdulist(
+            format=self.format, hdu_bands="SKYMAP_BANDS", hdu_region="SKYMAP_REGION"
+        )
+        hdulist.extend(hdulist_geom[1:])
         return hdulist
 
     def write_pha(self, dataset, filename):
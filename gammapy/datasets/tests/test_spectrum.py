@@ -554,6 +554,19 @@ class TestSpectrumOnOff:
 
         assert_allclose(newdataset.mask_safe.data, True)
 
+    def test_to_from_ogip_files_sherpa(self, tmp_path):
+        dataset = self.dataset.copy(name="test")
+        dataset.write(tmp_path / "test.fits", format="ogip-sherpa")
+        newdataset = SpectrumDatasetOnOff.read(tmp_path / "test.fits")
+
+        assert newdataset.counts.geom.axes["energy"].unit == "keV"
+        assert_allclose(
+            newdataset.counts.geom.axes["energy"].edges,
+            self.on_counts.geom.axes["energy"].edges,
+        )
+        assert_allclose(self.on_counts.data, newdataset.counts.data)
+        assert_allclose(self.off_counts.data, newdataset.counts_off.data)
+
     def test_to_from_ogip_files_zip(self, tmp_path):
         dataset = self.dataset.copy(name="test")
         dataset.write(tmp_path / "test.fits.gz")
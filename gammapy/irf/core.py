@@ -286,8 +286,9 @@ class IRF(metaclass=abc.ABCMeta):
             mask = self._mask_out_bounds(invalid)
             if not data.shape:
                 mask = mask.squeeze()
+            # fill out of bounds and non-finite values in a single pass
+            mask |= ~np.isfinite(data)
             data[mask] = self.interp_kwargs["fill_value"]
-            data[~np.isfinite(data)] = self.interp_kwargs["fill_value"]
         return data
 
     @staticmethod
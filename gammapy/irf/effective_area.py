@@ -155,9 +155,9 @@ class EffectiveAreaTable2D(IRF):
 
         energy = self.axes["energy_true"]
         offset = self.axes["offset"]
-        aeff = self.evaluate(
-            offset=offset.center, energy_true=energy.center[:, np.newaxis]
-        )
+        # the bin centers are the interpolation nodes, so use the data directly
+        # instead of evaluating on a new grid
+        aeff = self.quantity
 
         vmin, vmax = np.nanmin(aeff.value), np.nanmax(aeff.value)
 
@@ -243,10 +243,11 @@ class EffectiveAreaTable2D(IRF):
 
         offset_axis = MapAxis.from_edges([0.0, 5.0] * u.deg, name="offset")
         axes = MapAxes([energy_axis_true, offset_axis])
-        coords = axes.get_coord()
 
-        energy, offset = coords["energy_true"].to_value("MeV"), coords["offset"]
-        data = np.ones_like(offset.value) * g1 * energy ** (-g2) * np.exp(-g3 / energy)
+        # single offset bin, the data only depends on energy
+        energy = energy_axis_true.center.to_value("MeV")[:, np.newaxis]
+        # E^(-g2) exp(-g3 / E) fused into a single exp
+        data = g1 * np.exp(-g2 * np.log(energy) - g3 / energy)
 
         # TODO: fake offset dependence?
         meta = {"TELESCOP": instrument}
@@ -54,6 +54,19 @@ def test_from_parametrization():
     assert area.unit == area_ref.unit
     assert area.meta["TELESCOP"] == "HESS"
 
+    # repeated calls do not share the data array
+    area_2 = EffectiveAreaTable2D.from_parametrization(axis, "HESS")
+    area_2.data *= 2
+    assert_allclose(area.quantity[:, 0], area_ref)
+
+    area = EffectiveAreaTable2D.from_parametrization(instrument="CTA")
+    assert area.axes["energy_true"].nbin == 100
+    assert_allclose(area.axes["energy_true"].edges[[0, -1]], [2e-3, 200] * u.TeV)
+
+    # each default table has its own axis
+    area_2 = EffectiveAreaTable2D.from_parametrization(instrument="CTA")
+    assert area_2.axes["energy_true"] is not area.axes["energy_true"]
+
 
 @requires_data()
 def test_plot(aeff):
@@ -192,7 +192,8 @@ class SafeMaskMaker(Maker):
         model = TemplateSpectralModel.from_region_map(aeff)
 
         energy_true = model.energy
-        energy_min = energy_true[np.where(model.values > 0)[0][0]]
+        # first positive value, without building the full index array
+        energy_min = energy_true[np.argmax(model.values > 0)]
         energy_max = energy_true[-1]
 
         aeff_thres = (self.aeff_percent / 100) * aeff.quantity.max()
@@ -1,10 +1,18 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
 """Command line tool to download datasets and notebooks"""
+import contextlib
+import json
 import logging
+import queue
+import shutil
 import tarfile
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import urlparse
+from astropy.config import get_cache_dir
 from astropy.utils import lazyproperty
 import click
 from gammapy import __version__
@@ -12,6 +20,8 @@ from gammapy import __version__
 log = logging.getLogger(__name__)
 
 BUNDLESIZE = 152  # in MB
+BUFFERSIZE = 1024 * 1024  # in B
+TIMEOUT = (10, 60)  # connect and read timeout, in s
 GAMMAPY_BASE_URL = "https://gammapy.org/download/"
 
 RELEASE = __version__
@@ -20,6 +30,28 @@ if "dev" in __version__:
     RELEASE = "dev"
 
 
+@lru_cache(maxsize=1)
+def get_session():
+    """HTTP session shared by all downloads, to reuse the connections.
+
+    Failed connections and transient server errors are retried with an
+    exponential backoff.
+    """
+    import requests
+
+    retries = requests.adapters.Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        respect_retry_after_header=True,
+    )
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=16, max_retries=retries)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
 class DownloadIndex:
     """Download index"""
 
@@ -31,13 +63,48 @@ class DownloadIndex:
     def __init__(self, release=RELEASE):
         self.release = release
 
+    @property
+    def index_cache(self):
+        """Cached copy of the index and its ETag"""
+        return Path(get_cache_dir(rootname="gammapy")) / self._index_json
+
+    def fetch_index(self):
+        """Fetch the index of all releases.
+
+        The index is only transferred if it changed on the server since
+        the last call, otherwise the cached copy is used.
+        """
+        headers, cached = {}, None
+
+        try:
+            cached = json.loads(self.index_cache.read_text())
+            headers["If-None-Match"] = cached["etag"]
+        except (OSError, ValueError, KeyError):
+            cached = None
+
+        response = get_session().get(
+            GAMMAPY_BASE_URL + self._index_json, headers=headers, timeout=TIMEOUT
+        )
+
+        if response.status_code == 304 and cached is not None:
+            return cached["data"]
+
+        response.raise_for_status()
+        data = response.json()
+        etag = response.headers.get("ETag")
+
+        if etag:
+            try:
+                self.index_cache.write_text(json.dumps({"etag": etag, "data": data}))
+            except OSError:
+                log.warning("Could not cache the download index")
+
+        return data
+
     @lazyproperty
     def index(self):
         """Index for a given release"""
-        import requests
-
-        response = requests.get(GAMMAPY_BASE_URL + self._index_json)
-        data = response.json()
+        data = self.fetch_index()
 
         if self.release not in data:
             raise ValueError(
@@ -63,34 +130,247 @@ class DownloadIndex:
         return self.index[self._datasets_key]
 
 
-def progress_download(source, destination):
-    import requests
+def get_progress_bar(response, desc, progress_bar=None):
+    """Progress bar for the content of a streamed response.
+
+    If ``progress_bar`` is given, the content size is added to its total
+    instead, e.g. to show the progress of several concurrent downloads in
+    a single bar.
+    """
     from tqdm import tqdm
 
-    destination.parent.mkdir(parents=True, exist_ok=True)
-    with requests.get(source, stream=True) as r:
-        total_size = (
-            int(r.headers.get("content-length"))
-            if r.headers.get("content-length")
-            else BUNDLESIZE * 1024 * 1024
-        )
-        progress_bar = tqdm(
-            total=total_size, unit="B", unit_scale=True, unit_divisor=1024
+    total_size = (
+        int(response.headers.get("content-length"))
+        if response.headers.get("content-length")
+        else BUNDLESIZE * 1024 * 1024
+    )
+
+    if progress_bar is not None:
+        with progress_bar.get_lock():
+            progress_bar.total += total_size
+            progress_bar.refresh()
+        return contextlib.nullcontext(progress_bar)
+
+    return tqdm(
+        total=total_size, unit="B", unit_scale=True, unit_divisor=1024, desc=desc
+    )
+
+
+class ProgressReader:
+    """File-like object reading from a stream and updating a progress bar"""
+
+    def __init__(self, fileobj, progress_bar):
+        self.fileobj = fileobj
+        self.progress_bar = progress_bar
+
+    def read(self, size=-1):
+        chunk = self.fileobj.read(size)
+        self.progress_bar.update(len(chunk))
+        return chunk
+
+
+class BackgroundReader:
+    """File-like object reading ahead from a stream in a background thread.
+
+    The chunks are read into a bounded queue, so that the transfer goes on
+    while the consumer, e.g. the extraction of a bundle, is busy.
+
+    Parameters
+    ----------
+    fileobj : file-like
+        Stream to read from.
+    chunk_size : int
+        Size of the chunks read from the stream, in bytes.
+    maxsize : int
+        Maximum number of chunks read ahead.
+    """
+
+    def __init__(self, fileobj, chunk_size=BUFFERSIZE, maxsize=16):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._buffer = bytearray()
+        self._eof = False
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._read_ahead, args=(fileobj, chunk_size), daemon=True
         )
-        with open(destination, "wb") as f:
-            for chunk in r.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-                    progress_bar.update(len(chunk))
-    progress_bar.close()
+        self._thread.start()
+
+    def _read_ahead(self, fileobj, chunk_size):
+        try:
+            while not self._stop.is_set():
+                chunk = fileobj.read(chunk_size)
+                self._queue.put(chunk)
+                if not chunk:
+                    break
+        except Exception as error:
+            self._queue.put(error)
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            # the reader stopped after an error, raise it again on every call
+            if self._error is not None:
+                raise self._error
+
+            chunk = self._queue.get()
+
+            if isinstance(chunk, Exception):
+                self._error = chunk
+                raise chunk
+
+            self._eof = not chunk
+            self._buffer += chunk
+
+        size = len(self._buffer) if size < 0 else size
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self):
+        """Stop reading ahead, e.g. if the consumer failed"""
+        self._stop.set()
+
+        # unblock the background thread, if waiting for a free queue slot
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def conditional_get(source, last_modified):
+    """Streamed GET request, transferring the content only if it changed.
+
+    The ``Last-Modified`` header of a previous download is read from the
+    ``last_modified`` file and sent as ``If-Modified-Since``, so that the
+    server answers with 304 if the content is unchanged. The file is
+    removed, so that it is only written back once the new content is
+    stored completely, see `store_last_modified`.
+    """
+    headers = {}
+
+    if last_modified.exists():
+        headers["If-Modified-Since"] = last_modified.read_text()
+
+    response = get_session().get(source, stream=True, headers=headers, timeout=TIMEOUT)
+
+    if response.status_code != 304:
+        response.raise_for_status()
+        last_modified.unlink(missing_ok=True)
+
+    return response
+
+
+def store_last_modified(response, last_modified):
+    """Store the ``Last-Modified`` header of a completed download"""
+    value = response.headers.get("Last-Modified")
+
+    if value:
+        last_modified.write_text(value)
+
+
+def progress_download(
+    source, destination, progress_bar=None, force=False, keep_last_modified=True
+):
+    """Download a file, if it changed since the last download.
+
+    Parameters
+    ----------
+    source : str
+        URL of the file.
+    destination : `~pathlib.Path`
+        Path of the downloaded file.
+    progress_bar : ``tqdm.tqdm``
+        Shared progress bar, see `get_progress_bar`.
+    force : bool
+        Download the file, even if the destination is up to date.
+    keep_last_modified : bool
+        Whether to store the ``Last-Modified`` date of the download, see
+        `store_last_modified`. Disable it for files removed after use.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    last_modified = destination.parent / f".{destination.name}.last-modified"
+
+    if force or not destination.exists():
+        last_modified.unlink(missing_ok=True)
+
+    with conditional_get(source, last_modified) as r:
+        if r.status_code == 304:
+            log.info(f"{destination} is up to date")
+            return
+
+        # undo a possible transfer encoding, as `iter_content` does
+        r.raw.decode_content = True
+
+        # write to a temporary file, so that a failed download does not
+        # leave a truncated file at the destination
+        partial = destination.parent / f"{destination.name}.part"
+
+        try:
+            progress = get_progress_bar(r, destination.name, progress_bar)
+            with progress as bar, open(partial, "wb") as f:
+                reader = ProgressReader(r.raw, bar)
+                shutil.copyfileobj(reader, f, length=BUFFERSIZE)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+
+        partial.replace(destination)
+
+        if keep_last_modified:
+            store_last_modified(r, last_modified)
+
+
+def progress_download_many(downloads, max_workers=4, **kwargs):
+    """Download several files concurrently, with a single progress bar.
+
+    Parameters
+    ----------
+    downloads : list of tuple
+        List of ``(source, destination)`` pairs, see `progress_download`.
+        A third item is a dict of keyword arguments for this download only.
+    max_workers : int
+        Maximum number of concurrent downloads.
+    **kwargs : dict
+        Keyword arguments passed to `progress_download`.
+    """
+    from tqdm import tqdm
+
+    desc = f"{len(downloads)} files"
+    progress_bar = tqdm(
+        total=0, unit="B", unit_scale=True, unit_divisor=1024, desc=desc
+    )
+
+    with progress_bar, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for source, destination, *options in downloads:
+            download_kwargs = {**kwargs, **options[0]} if options else kwargs
+            future = executor.submit(
+                progress_download, source, destination, progress_bar, **download_kwargs
+            )
+            futures.append(future)
+
+        # the remaining downloads are completed before a failure is raised
+        for future in as_completed(futures):
+            future.result()
 
 
 def members(tf):
-    list_members = tf.getmembers()
-    root_folder = list_members[0].name
-    for member in list_members:
-        if member.path.startswith(root_folder):
-            member.path = member.path[len(root_folder) + 1 :]  # noqa: E203
+    # iterate lazily, reading all member headers up front with getmembers
+    # would decompress the whole archive once more before extraction
+    root_folder = None
+    for member in tf:
+        if root_folder is None:
+            root_folder = member.name
+            offset = len(root_folder) + 1
+        if member.name.startswith(root_folder):
+            member.name = member.name[offset:]
             yield member
 
 
@@ -99,6 +379,52 @@ def extract_bundle(bundle, destination):
         tar.extractall(path=destination, members=members(tar))
 
 
+def progress_download_bundle(source, destination, strip_root=True, force=False):
+    """Download and extract a tar bundle, in a single pass over the stream.
+
+    The archive is decompressed and extracted while it is downloaded,
+    without storing the bundle in a temporary file.
+
+    Parameters
+    ----------
+    source : str
+        URL of the tar bundle.
+    destination : `~pathlib.Path`
+        Folder to extract the bundle to.
+    strip_root : bool
+        Whether to strip the root folder of the bundle, see `members`.
+    force : bool
+        Download and extract the bundle, even if the destination is up to
+        date. Files changed since the last extraction are overwritten.
+    """
+    name = Path(urlparse(source).path).name
+
+    # the extraction is skipped, if the bundle did not change since the
+    # last download to this destination
+    last_modified = Path(destination) / f".{name}.last-modified"
+
+    if force:
+        last_modified.unlink(missing_ok=True)
+
+    with conditional_get(source, last_modified) as r:
+        if r.status_code == 304:
+            log.info(f"{destination} is up to date with {source}")
+            return
+
+        # undo a possible transfer encoding, the archive itself stays compressed
+        r.raw.decode_content = True
+
+        with get_progress_bar(r, desc=name) as bar:
+            # the transfer goes on in the background during the extraction
+            with BackgroundReader(ProgressReader(r.raw, bar)) as fileobj:
+                tar = tarfile.open(fileobj=fileobj, mode="r|*", bufsize=BUFFERSIZE)
+                with tar:
+                    tar_members = members(tar) if strip_root else None
+                    tar.extractall(path=destination, members=tar_members)
+
+        store_last_modified(r, last_modified)
+
+
 def show_info_notebooks(outfolder, release):
     print("")
     print(
@@ -136,29 +462,53 @@ def show_info_datasets(outfolder, release):
     help="Path where the versioned notebook files will be copied.",
     show_default=True,
 )
-def cli_download_notebooks(release, out):
+@click.option(
+    "--force",
+    default=False,
+    is_flag=True,
+    help="Download again, even if up to date.",
+)
+def cli_download_notebooks(release, out, force):
     """Download notebooks"""
     index = DownloadIndex(release=release)
 
     path = Path(out) / index.release
 
     filename = path / f"gammapy-{index.release}-environment.yml"
-    progress_download(index.environment_url, filename)
-
     url_path = urlparse(index.notebooks_url).path
     filename_destination = path / Path(url_path).name
-    progress_download(index.notebooks_url, filename_destination)
 
     if "zip" in index.notebooks_url:
-        archive = zipfile.ZipFile(filename_destination, "r")
-    else:
-        archive = tarfile.open(filename_destination)
+        # the archive is removed after the extraction
+        progress_download_many(
+            [
+                (index.environment_url, filename),
+                (
+                    index.notebooks_url,
+                    filename_destination,
+                    dict(keep_last_modified=False),
+                ),
+            ],
+            force=force,
+        )
 
-    with archive as ref:
-        ref.extractall(path)
+        with zipfile.ZipFile(filename_destination, "r") as ref:
+            ref.extractall(path)
 
-    # delete file
-    filename_destination.unlink()
+        # delete file
+        filename_destination.unlink()
+    else:
+        # the tar archive is extracted while it is downloaded, overlapped
+        # with the download of the environment file
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            environment = executor.submit(
+                progress_download, index.environment_url, filename, force=force
+            )
+            progress_download_bundle(
+                index.notebooks_url, path, strip_root=False, force=force
+            )
+
+        environment.result()
 
     show_info_notebooks(path, release)
 
@@ -176,16 +526,17 @@ def cli_download_notebooks(release, out):
     help="Destination folder.",
     show_default=True,
 )
-def cli_download_datasets(release, out):
+@click.option(
+    "--force",
+    default=False,
+    is_flag=True,
+    help="Download again, even if up to date.",
+)
+def cli_download_datasets(release, out, force):
     """Download datasets"""
     index = DownloadIndex(release=release)
 
     localfolder = Path(out) / index.release
-    log.info(f"Downloading datasets from {index.datasets_url}")
-    tar_destination_file = localfolder / "datasets.tar.gz"
-    progress_download(index.datasets_url, tar_destination_file)
-
-    log.info(f"Extracting {tar_destination_file}")
-    extract_bundle(tar_destination_file, localfolder)
-    Path(tar_destination_file).unlink()
+    log.info(f"Downloading and extracting datasets from {index.datasets_url}")
+    progress_download_bundle(index.datasets_url, localfolder, force=force)
     show_info_datasets(localfolder, release)
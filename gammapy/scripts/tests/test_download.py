@@ -1,5 +1,9 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
+import io
+import tarfile
+import zipfile
 import pytest
+from gammapy.scripts import download
 from gammapy.scripts.main import cli
 from gammapy.utils.testing import requires_dependency, run_cli
 
@@ -65,3 +69,275 @@ def test_cli_download_datasets(tmp_path):
     result = run_cli(cli, args)
     assert (tmp_path / "dev").exists()
     assert "GAMMAPY_DATA" in result.output
+
+
+@requires_dependency("tqdm")
+def test_progress_download_many(tmp_path, monkeypatch):
+    def progress_download(source, destination, progress_bar):
+        if source == "fail":
+            raise ValueError(source)
+        destination.write_text(source)
+
+    monkeypatch.setattr(download, "progress_download", progress_download)
+
+    downloads = [("a", tmp_path / "a.txt"), ("b", tmp_path / "b.txt")]
+    download.progress_download_many(downloads)
+    assert (tmp_path / "b.txt").read_text() == "b"
+
+    downloads = [("fail", tmp_path / "fail.txt"), ("c", tmp_path / "c.txt")]
+    with pytest.raises(ValueError):
+        download.progress_download_many(downloads)
+    assert (tmp_path / "c.txt").exists()
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None, raw=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+        self.raw = raw
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(self.status_code)
+
+
+class FakeSession:
+    """Fake HTTP session, serving the responses added per URL.
+
+    Conditional requests matching the ``ETag`` or ``Last-Modified`` header
+    of a response are answered with 304.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+        self.timeouts = []
+
+    def add(self, url, content=b"", data=None, headers=None, status_code=200, raw=None):
+        self.responses[url] = dict(
+            content=content,
+            data=data,
+            headers=headers or {},
+            status_code=status_code,
+            raw=raw,
+        )
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        headers = headers or {}
+        self.requests.append((url, headers))
+        self.timeouts.append(timeout)
+        response = self.responses[url]
+        response_headers = response["headers"]
+
+        for key, key_response in [
+            ("If-None-Match", "ETag"),
+            ("If-Modified-Since", "Last-Modified"),
+        ]:
+            if key in headers and headers[key] == response_headers.get(key_response):
+                return FakeResponse(304)
+
+        raw = response["raw"] or io.BytesIO(response["content"])
+        response_headers = {
+            "content-length": str(len(response["content"])),
+            **response_headers,
+        }
+        return FakeResponse(
+            response["status_code"], response["data"], response_headers, raw
+        )
+
+
+class FailingStream:
+    def read(self, size):
+        raise OSError("connection reset")
+
+
+@pytest.fixture()
+def session(tmp_path, monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(download, "get_session", lambda: session)
+    monkeypatch.setattr(download.DownloadIndex, "index_cache", tmp_path / "index.json")
+    return session
+
+
+def make_bundle(path, mode="w:gz"):
+    root = path / "gammapy-datasets"
+    (root / "sub").mkdir(parents=True)
+    (root / "sub" / "data.txt").write_text("data")
+
+    bundle = io.BytesIO()
+    with tarfile.open(fileobj=bundle, mode=mode) as tar:
+        tar.add(root, arcname=root.name)
+
+    return bundle.getvalue()
+
+
+def test_download_index_etag(session):
+    index_url = download.GAMMAPY_BASE_URL + "index.json"
+    index_data = {"0.20": {"datasets": "datasets.tar.gz"}}
+    session.add(index_url, data=index_data, headers={"ETag": "abc"})
+
+    index = download.DownloadIndex(release="0.20")
+    assert index.datasets_url == "datasets.tar.gz"
+
+    index = download.DownloadIndex(release="0.20")
+    assert index.datasets_url == "datasets.tar.gz"
+
+    headers = [headers for _, headers in session.requests]
+    assert headers == [{}, {"If-None-Match": "abc"}]
+    assert session.timeouts == [download.TIMEOUT] * 2
+
+
+def test_extract_bundle(tmp_path):
+    bundle = tmp_path / "datasets.tar.gz"
+    bundle.write_bytes(make_bundle(tmp_path))
+
+    download.extract_bundle(bundle, tmp_path / "out")
+    assert (tmp_path / "out" / "sub" / "data.txt").read_text() == "data"
+
+
+@requires_dependency("tqdm")
+def test_progress_download_bundle(tmp_path, session):
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    session.add(
+        "datasets.tar.gz",
+        content=make_bundle(tmp_path),
+        headers={"Last-Modified": last_modified},
+    )
+
+    download.progress_download_bundle("datasets.tar.gz", tmp_path / "out")
+    assert (tmp_path / "out" / "sub" / "data.txt").read_text() == "data"
+    assert session.timeouts == [download.TIMEOUT]
+
+    # unchanged bundle, the extracted files are not touched
+    (tmp_path / "out" / "sub" / "data.txt").write_text("modified")
+    download.progress_download_bundle("datasets.tar.gz", tmp_path / "out")
+    assert (tmp_path / "out" / "sub" / "data.txt").read_text() == "modified"
+
+    download.progress_download_bundle("datasets.tar.gz", tmp_path / "out", force=True)
+    assert (tmp_path / "out" / "sub" / "data.txt").read_text() == "data"
+
+
+@requires_dependency("tqdm")
+def test_cli_download_notebooks_tar(tmp_path, session):
+    notebooks = tmp_path / "notebooks"
+    notebooks.mkdir()
+    (notebooks / "overview.ipynb").write_text("{}")
+
+    bundle = io.BytesIO()
+    with tarfile.open(fileobj=bundle, mode="w") as tar:
+        tar.add(notebooks / "overview.ipynb", arcname="overview.ipynb")
+
+    index_data = {
+        "0.20": {
+            "notebooks": "https://gammapy.org/notebooks.tar",
+            "conda-environment": "https://gammapy.org/environment.yml",
+        }
+    }
+    session.add(download.GAMMAPY_BASE_URL + "index.json", data=index_data)
+    session.add("https://gammapy.org/notebooks.tar", content=bundle.getvalue())
+    session.add("https://gammapy.org/environment.yml", content=b"name: gammapy")
+
+    out = tmp_path / "out"
+    run_cli(cli, ["download", "notebooks", f"--out={out}", "--release=0.20"])
+    assert (out / "0.20" / "gammapy-0.20-environment.yml").exists()
+    assert (out / "0.20" / "overview.ipynb").read_text() == "{}"
+
+
+@requires_dependency("tqdm")
+def test_cli_download_notebooks_zip(tmp_path, session):
+    notebooks = io.BytesIO()
+    with zipfile.ZipFile(notebooks, "w") as ref:
+        ref.writestr("overview.ipynb", "{}")
+
+    index_data = {
+        "0.20": {
+            "notebooks": "https://gammapy.org/notebooks.zip",
+            "conda-environment": "https://gammapy.org/environment.yml",
+        }
+    }
+    last_modified = {"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    session.add(download.GAMMAPY_BASE_URL + "index.json", data=index_data)
+    session.add(
+        "https://gammapy.org/notebooks.zip",
+        content=notebooks.getvalue(),
+        headers=last_modified,
+    )
+    session.add(
+        "https://gammapy.org/environment.yml",
+        content=b"name: gammapy",
+        headers=last_modified,
+    )
+
+    out = tmp_path / "out"
+    args = ["download", "notebooks", f"--out={out}", "--release=0.20"]
+    run_cli(cli, args)
+
+    filenames = sorted(path.name for path in (out / "0.20").iterdir())
+    assert filenames == [
+        ".gammapy-0.20-environment.yml.last-modified",
+        "gammapy-0.20-environment.yml",
+        "overview.ipynb",
+    ]
+
+    session.requests.clear()
+    run_cli(cli, args + ["--force"])
+    assert all("If-Modified-Since" not in headers for _, headers in session.requests)
+
+
+def test_background_reader():
+    data = bytes(range(256)) * 100
+
+    with download.BackgroundReader(io.BytesIO(data), chunk_size=1000) as reader:
+        assert reader.read(10) == data[:10]
+        assert reader.read(2500) == data[10:2510]
+        assert reader.read() == data[2510:]
+        assert reader.read(10) == b""
+
+    with download.BackgroundReader(FailingStream()) as reader:
+        with pytest.raises(OSError):
+            reader.read(10)
+
+        with pytest.raises(OSError):
+            reader.read(10)
+
+    # stop reading ahead, with the queue full
+    reader = download.BackgroundReader(io.BytesIO(data), chunk_size=10, maxsize=2)
+    reader.close()
+    assert not reader._thread.is_alive()
+
+
+@requires_dependency("tqdm")
+def test_progress_download_failed(tmp_path, session):
+    session.add("missing", status_code=404)
+    session.add("environment.yml", raw=FailingStream())
+
+    destination = tmp_path / "environment.yml"
+
+    with pytest.raises(OSError):
+        download.progress_download("missing", destination)
+
+    with pytest.raises(OSError):
+        download.progress_download("environment.yml", destination)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@requires_dependency("tqdm")
+def test_progress_download_many_progress_bar(tmp_path, session):
+    session.add("a", content=b"a" * 100)
+    session.add("b", content=b"b" * 50)
+
+    downloads = [("a", tmp_path / "a.txt"), ("b", tmp_path / "b.txt")]
+    download.progress_download_many(downloads)
+    assert (tmp_path / "a.txt").read_bytes() == b"a" * 100
+    assert (tmp_path / "b.txt").read_bytes() == b"b" * 50
@@ -3,7 +3,11 @@ import pytest
 import numpy as np
 import astropy.units as u
 from gammapy.maps import MapAxis
-from gammapy.utils.units import energy_unit_format, standardise_unit
+from gammapy.utils.units import (
+    energy_unit_format,
+    standardise_unit,
+    unit_from_fits_image_hdu,
+)
 
 
 def test_standardise_unit():
@@ -15,6 +19,8 @@ def test_standardise_unit():
 axis = MapAxis.from_nodes([1e-1, 200, 3.5e3, 4.6e4], name="energy", unit="GeV")
 values = [
     (1530 * u.eV, "1.53 keV"),
+    (9995 * u.eV, "10.00 keV"),
+    (99.95 * u.TeV, "100.0 TeV"),
     (1530 * u.keV, "1.53 MeV"),
     (1530e4 * u.keV, "15.3 GeV"),
     (1530 * u.GeV, "1.53 TeV"),
@@ -24,6 +30,7 @@ values = [
         np.array([1e3, 3.5e6, 400.4e12, 1512.5e12]) * u.eV,
         ("1.00 keV", "3.50 MeV", "400 TeV", "1.51 PeV"),
     ),
+    (np.array([9995, 99.95e12]) * u.eV, ("10.00 keV", "100.0 TeV")),
     (
         [1.54e2 * u.GeV, 4300 * u.keV, 300.6e12 * u.eV],
         ("154 GeV", "4.30 MeV", "301 TeV"),
@@ -39,3 +46,17 @@ values = [
 @pytest.mark.parametrize("q, expect", values)
 def test_energy_unit_format(q, expect):
     assert energy_unit_format(q) == expect
+
+
+def test_standardise_unit_cached():
+    unit = standardise_unit("ph cm-2 s-1 TeV-1")
+    assert standardise_unit("ph cm-2 s-1 TeV-1") is unit
+    assert standardise_unit(u.Unit("ph cm-2 s-1 TeV-1")) == unit
+
+
+def test_unit_from_fits_image_hdu(caplog):
+    assert unit_from_fits_image_hdu({"BUNIT": "ct s-1"}) == "s-1"
+    assert unit_from_fits_image_hdu({}) == ""
+
+    assert unit_from_fits_image_hdu({"BUNIT": "invalid"}) == ""
+    assert "Invalid value BUNIT='invalid'" in caplog.text
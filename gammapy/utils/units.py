@@ -1,7 +1,8 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
 """Units and Quantity related helper functions"""
 import logging
-from math import floor
+from functools import lru_cache
+from math import floor, log10
 import numpy as np
 import astropy.units as u
 
@@ -9,6 +10,10 @@ __all__ = ["standardise_unit", "unit_from_fits_image_hdu"]
 
 log = logging.getLogger(__name__)
 
+_DROP_BASES = frozenset(["ph", "ct"])
+_ENERGY_UNITS = (u.eV, u.keV, u.MeV, u.GeV, u.TeV, u.PeV)
+_ENERGY_UNIT_NAMES = tuple(str(unit) for unit in _ENERGY_UNITS)
+
 
 def standardise_unit(unit):
     """Standardise unit.
@@ -38,16 +43,37 @@ def standardise_unit(unit):
     >>> standardise_unit('cm-2 s-1')
     Unit("1 / (cm2 s)")
     """
+    if isinstance(unit, str):
+        return _standardise_unit_str(unit)
+
     unit = u.Unit(unit)
+    names = [base.name for base in unit.bases]
+
+    # common case, nothing to drop
+    if _DROP_BASES.isdisjoint(names):
+        return unit
+
     bases, powers = [], []
-    for base, power in zip(unit.bases, unit.powers):
-        if str(base) not in {"ph", "ct"}:
+    for base, power, name in zip(unit.bases, unit.powers, names):
+        if name not in _DROP_BASES:
             bases.append(base)
             powers.append(power)
 
     return u.CompositeUnit(scale=unit.scale, bases=bases, powers=powers)
 
 
+@lru_cache(maxsize=16)
+def _energy_scales(unit):
+    """Factors converting ``unit`` to `_ENERGY_UNITS`, as used by ``to_value``"""
+    return tuple(unit.to(energy_unit) for energy_unit in _ENERGY_UNITS)
+
+
+@lru_cache(maxsize=256)
+def _standardise_unit_str(unit):
+    """Cached `standardise_unit` for strings, which are parsed only once"""
+    return standardise_unit(u.Unit(unit))
+
+
 def unit_from_fits_image_hdu(header):
     """Read unit from a FITS image HDU.
 
@@ -59,13 +85,12 @@ def unit_from_fits_image_hdu(header):
     """
     unit = header.get("BUNIT", "")
 
+    # the unit is parsed only once, in `standardise_unit`
     try:
-        u.Unit(unit)
+        return standardise_unit(unit)
     except ValueError:
         log.warning(f"Invalid value BUNIT={unit!r} in FITS header. Setting empty unit.")
-        unit = ""
-
-    return standardise_unit(unit)
+        return standardise_unit("")
 
 
 def energy_unit_format(E):
@@ -83,6 +108,9 @@ def energy_unit_format(E):
     str : str
         Returns a string or tuple of strings with energy unit formatted
     """
+    if isinstance(E, u.Quantity) and E.ndim == 1:
+        return _energy_unit_format_array(E)
+
     try:
         iter(E)
     except TypeError:
@@ -90,11 +118,33 @@ def energy_unit_format(E):
     else:
         return tuple(map(energy_unit_format, E))
 
-    i = floor(np.log10(E.to_value(u.eV)) / 3)  # a new unit every 3 decades
-    unit = (u.eV, u.keV, u.MeV, u.GeV, u.TeV, u.PeV)[i] if i < 5 else u.PeV
+    # the same factors as `~astropy.units.Quantity.to_value`, so that the
+    # values are rounded identically
+    value, scales = E.value, _energy_scales(E.unit)
+    i = min(
+        max(floor(log10(value * scales[0]) / 3), 0), 5
+    )  # a new unit every 3 decades
+    unit = _ENERGY_UNIT_NAMES[i]
 
-    v = E.to_value(unit)
-    i = floor(np.log10(v))
+    v = value * scales[i]
+    i = max(floor(log10(v)), 0)
     prec = (2, 1, 0)[i] if i < 3 else 0
 
     return f"{v:0.{prec}f} {unit}"
+
+
+def _energy_unit_format_array(E):
+    """Vectorised `energy_unit_format` for a 1D energy array"""
+    value, scales = E.value, np.array(_energy_scales(E.unit))
+
+    # a new unit every 3 decades
+    idx_unit = np.clip(np.floor(np.log10(value * scales[0]) / 3).astype(int), 0, 5)
+    value = value * scales[idx_unit]
+
+    idx_prec = np.clip(np.floor(np.log10(value)).astype(int), 0, 3)
+    precision = np.array([2, 1, 0, 0])[idx_prec]
+
+    return tuple(
+        f"{v:0.{prec}f} {_ENERGY_UNIT_NAMES[idx]}"
+        for v, prec, idx in zip(value.tolist(), precision.tolist(), idx_unit.tolist())
+    )